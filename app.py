@@ -1,21 +1,37 @@
-from flask import Flask, jsonify, request, redirect, send_from_directory
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, abort, g, request, redirect
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
+from sqlalchemy import event
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.pool import QueuePool
 from flask_swagger_ui import get_swaggerui_blueprint
-from prometheus_client import generate_latest, Histogram, Counter
-from opentelemetry import trace
-from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.instrumentation.flask import FlaskInstrumentor
-from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
-from opentelemetry.sdk.resources import Resource
+from prometheus_client import generate_latest
+from metrics import (http_requests, request_count, request_latency,
+                     response_size)
+from models import db, Category, Bike
+from tracing import tracer, tracing_enabled, instrument
+import functools
+import orjson
 import os
 import time
 import logging
 
 
+# JSON-провайдер на orjson: request.json и app.json без stdlib json
+class OrJsonProvider(DefaultJSONProvider):
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+
 # Инициализация приложения Flask
 app = Flask(__name__)
+app.json = OrJsonProvider(app)
+# /static/ (в т.ч. openapi.yaml) отдается встроенным обработчиком Flask
+# с ETag/Last-Modified; браузер кэширует файлы на сутки
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 86400
 
 
 # Настройки базы данных SQLite
@@ -23,7 +39,40 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + \
     os.path.join(basedir, 'bikeshop.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+# Пул держит уже настроенные PRAGMA-соединения между запросами
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'poolclass': QueuePool,
+    'pool_size': 20,
+    'max_overflow': 10,
+    'pool_recycle': 1800,
+    'pool_pre_ping': False,
+    'connect_args': {'check_same_thread': False},
+}
+db.init_app(app)
+
+
+# WAL-журнал и настройки SQLite для каждого нового соединения
+with app.app_context():
+    @event.listens_for(db.engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute('PRAGMA mmap_size=268435456')
+        cursor.execute('PRAGMA cache_size=-64000')
+        cursor.close()
+
+
+# Кэш для редко меняющихся данных о категориях (в памяти процесса:
+# приложение работает одним процессом gunicorn, см. Dockerfile)
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache'})
+
+
+def invalidate_category_cache(category_id=None):
+    cache.delete('view//categories')
+    if category_id is not None:
+        cache.delete(f'view//categories/{category_id}')
 
 
 # Настройка логирования
@@ -31,19 +80,22 @@ logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger("bikeshop")
 
 
-# Настройка метрик Prometheus
-request_count = Counter('bikeshop_requests_total',
-                        'Total number of requests')
-request_latency = Histogram('bikeshop_request_latency_seconds',
-                            'Request latency in seconds')
-response_size = Histogram('bikeshop_response_size_bytes',
-                          'Response size in bytes')
+# Ответ /metrics переиспользуется в пределах короткого окна
+METRICS_CACHE_TTL = 0.5
+_metrics_cache = [0.0, b'']
 
 
 @app.route('/metrics')
 def metrics_endpoint():
-    return generate_latest(), 200, {'Content-Type':
-                                    'text/plain; version=0.0.4; charset=utf-8'}
+    now = time.monotonic()
+    generated_at, body = _metrics_cache
+    if now - generated_at > METRICS_CACHE_TTL:
+        # Сначала генерируем, затем заменяем пару целиком: параллельный
+        # запрос видит либо старое, либо новое тело, но не пустое
+        body = generate_latest()
+        _metrics_cache[:] = [now, body]
+    return body, 200, {'Content-Type':
+                       'text/plain; version=0.0.4; charset=utf-8'}
 
 
 # Swagger UI
@@ -60,90 +112,108 @@ def index():
     return redirect('/swagger')
 
 
-@app.route('/static/<path:path>')
-def send_spec(path):
-    return send_from_directory('static', path)
+# Инструментирование и инициализация базы данных
+with app.app_context():  # Устанавливаем контекст приложения
+    instrument(app, db.engine)
+    db.create_all()
+    # create_all не трогает существующие таблицы: докатываем новые индексы.
+    # IF NOT EXISTS, чтобы одновременный старт нескольких процессов не падал
+    with db.engine.begin() as connection:
+        for table_index in Bike.__table__.indexes:
+            connection.execute(CreateIndex(table_index, if_not_exists=True))
 
 
-# OpenTelemetry: настройка трейсинга
-resource = Resource(attributes={"service.name": "bikeshop"})
-trace_provider = TracerProvider(resource=resource)
-trace.set_tracer_provider(trace_provider)
+# Метрики собираются в одном месте для всех эндпоинтов API
+UNMETERED_ENDPOINTS = {'metrics_endpoint', 'static', 'index'}
 
-otlp_exporter = OTLPSpanExporter(
-    endpoint="http://localhost:4318/v1/traces",
-    headers={}
-)
-span_processor = BatchSpanProcessor(otlp_exporter)
-trace_provider.add_span_processor(span_processor)
 
-tracer = trace.get_tracer(__name__)
+def is_metered():
+    return (request.blueprint is None
+            and request.endpoint not in UNMETERED_ENDPOINTS)
 
 
-# Инструментирование Flask и SQLAlchemy
-FlaskInstrumentor().instrument_app(app)
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter_ns()
 
-with app.app_context():  # Устанавливаем контекст приложения
-    SQLAlchemyInstrumentor().instrument(engine=db.engine)
 
+@app.after_request
+def record_metrics(response):
+    start = g.pop('request_start', None)
+    if start is None or not is_metered():
+        return response
+    latency = (time.perf_counter_ns() - start) * 1e-9
+    endpoint = request.endpoint or 'unknown'
+    request_latency.observe(latency)
+    response_size.observe(response.calculate_content_length() or 0)
+    request_count.inc()
+    http_requests.labels(endpoint=endpoint, status=response.status_code).inc()
+    logger.info(f"Endpoint {endpoint} executed in {latency:.2f} seconds.")
+    return response
 
-# Модели базы данных
-class Category(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), nullable=False)
 
-    def to_dict(self):
-        return {"id": self.id, "name": self.name}
+# Обертка для трейсинга обработчика отдельным спаном
+def time_request(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not tracing_enabled:
+            return func(*args, **kwargs)
+        with tracer.start_as_current_span(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
 
 
-class Bike(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    stock = db.Column(db.Integer, nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
-    category = db.relationship('Category', backref=db.backref('bikes', lazy=True))
+# Сериализация ответов через orjson вместо stdlib json
+def jsonify_fast(obj, status=200):
+    return app.response_class(orjson.dumps(obj), status=status,
+                              mimetype='application/json')
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "price": self.price,
-            "stock": self.stock,
-            "category": self.category.name
-        }
 
+# Пакетная вставка: один flush на каждые batch_size объектов и один commit
+class BulkModelSave:
+    def __init__(self, session, batch_size=500):
+        self.session = session
+        self.batch_size = batch_size
+        self.batch = []
 
-# Инициализация базы данных
-with app.app_context():
-    db.create_all()
+    def add(self, obj):
+        self.batch.append(obj)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
 
+    def flush(self):
+        if self.batch:
+            self.session.bulk_save_objects(self.batch)
+            self.batch = []
 
-# Обертка для измерения времени выполнения
-def time_request(func):
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        with tracer.start_as_current_span(func.__name__):
-            result = func(*args, **kwargs)
-        latency = time.time() - start_time
-
-        # Логирование метрик
-        request_latency.observe(latency)
-        response_size.observe(len(result.data) if hasattr(result, 'data') else 0)
-        request_count.inc()
-        logger.info(f"Endpoint {func.__name__} executed in {latency:.2f} seconds.")
-        return result
-    wrapper.__name__ = func.__name__
-    return wrapper
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.session.rollback()
+            return False
+        self.flush()
+        self.session.commit()
+        return False
+
+
+# Запросы горячих списков строятся один раз при импорте модуля
+_categories_stmt = db.select(Category.id, Category.name)
+_bikes_stmt = db.select(
+    Bike.id, Bike.name, Bike.price, Bike.stock, Category.name
+).join(Category)
 
 
 # CRUD для категорий
 @app.route('/categories', methods=['GET'])
 @time_request
+@cache.cached(timeout=60)
 def get_categories():
-    categories = Category.query.all()
+    rows = db.session.execute(_categories_stmt).all()
     logger.info("Fetched all categories.")
-    return jsonify([c.to_dict() for c in categories])
+    data = [{"id": id_, "name": name} for id_, name in rows]
+    return jsonify_fast(data)
 
 
 @app.route('/categories', methods=['POST'])
@@ -153,16 +223,18 @@ def create_category():
     new_category = Category(name=data['name'])
     db.session.add(new_category)
     db.session.commit()
+    invalidate_category_cache()
     logger.info(f"Category created: {new_category.name}")
-    return jsonify(new_category.to_dict()), 201
+    return jsonify_fast(new_category.to_dict(), status=201)
 
 
 @app.route('/categories/<int:category_id>', methods=['GET'])
 @time_request
+@cache.cached(timeout=60)
 def get_category(category_id):
     category = Category.query.get_or_404(category_id)
     logger.info(f"Fetched category: {category.name}")
-    return jsonify(category.to_dict())
+    return jsonify_fast(category.to_dict())
 
 
 @app.route('/categories/<int:category_id>', methods=['PUT'])
@@ -172,8 +244,9 @@ def update_category(category_id):
     category = Category.query.get_or_404(category_id)
     category.name = data.get('name', category.name)
     db.session.commit()
+    invalidate_category_cache(category_id)
     logger.info(f"Updated category {category_id}: {category.name}")
-    return jsonify(category.to_dict())
+    return jsonify_fast(category.to_dict())
 
 
 @app.route('/categories/<int:category_id>', methods=['DELETE'])
@@ -182,6 +255,7 @@ def delete_category(category_id):
     category = Category.query.get_or_404(category_id)
     db.session.delete(category)
     db.session.commit()
+    invalidate_category_cache(category_id)
     logger.info(f"Deleted category {category_id}.")
     return '', 204
 
@@ -190,9 +264,13 @@ def delete_category(category_id):
 @app.route('/bikes', methods=['GET'])
 @time_request
 def get_bikes():
-    bikes = Bike.query.all()
+    # Проекция без гидрации ORM-объектов: один JOIN, плоские кортежи
+    rows = db.session.execute(_bikes_stmt).all()
     logger.info("Fetched all bikes.")
-    return jsonify([b.to_dict() for b in bikes])
+    data = [{"id": id_, "name": name, "price": price, "stock": stock,
+             "category": category}
+            for id_, name, price, stock, category in rows]
+    return jsonify_fast(data)
 
 
 @app.route('/bikes', methods=['POST'])
@@ -207,7 +285,45 @@ def create_bike():
     db.session.add(new_bike)
     db.session.commit()
     logger.info(f"Bike created: {new_bike.name}")
-    return jsonify(new_bike.to_dict()), 201
+    return jsonify_fast(new_bike.to_dict(), status=201)
+
+
+# Проверка элемента пакетной вставки до обращения к базе
+BIKE_FIELD_TYPES = {
+    'name': str,
+    'price': (int, float),
+    'stock': int,
+    'category_id': int,
+}
+
+
+def is_valid_bike(item):
+    return isinstance(item, dict) and all(
+        isinstance(item.get(field), types)
+        and not isinstance(item.get(field), bool)
+        for field, types in BIKE_FIELD_TYPES.items())
+
+
+@app.route('/bikes/bulk', methods=['POST'])
+@time_request
+def create_bikes_bulk():
+    data = request.json
+    if not isinstance(data, list) or not all(map(is_valid_bike, data)):
+        abort(400)
+    category_ids = {item['category_id'] for item in data}
+    existing_ids = set(db.session.execute(
+        db.select(Category.id).where(Category.id.in_(category_ids))
+    ).scalars())
+    if category_ids - existing_ids:
+        abort(404)
+    with BulkModelSave(db.session) as bulk:
+        for item in data:
+            bulk.add(Bike(name=item['name'],
+                          price=item['price'],
+                          stock=item['stock'],
+                          category_id=item['category_id']))
+    logger.info(f"Bulk created {len(data)} bikes.")
+    return jsonify_fast({"created": len(data)}, status=201)
 
 
 @app.route('/bikes/<int:bike_id>', methods=['GET'])
@@ -215,7 +331,7 @@ def create_bike():
 def get_bike(bike_id):
     bike = Bike.query.get_or_404(bike_id)
     logger.info(f"Fetched bike: {bike.name}")
-    return jsonify(bike.to_dict())
+    return jsonify_fast(bike.to_dict())
 
 
 @app.route('/bikes/<int:bike_id>', methods=['PUT'])
@@ -231,7 +347,7 @@ def update_bike(bike_id):
         bike.category_id = category.id
     db.session.commit()
     logger.info(f"Updated bike {bike_id}: {bike.name}")
-    return jsonify(bike.to_dict())
+    return jsonify_fast(bike.to_dict())
 
 
 @app.route('/bikes/<int:bike_id>', methods=['DELETE'])
@@ -242,7 +358,3 @@ def delete_bike(bike_id):
     db.session.commit()
     logger.info(f"Deleted bike {bike_id}.")
     return '', 204
-
-
-if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,15 @@
+from prometheus_client import Histogram, Counter
+
+
+# Настройка метрик Prometheus
+request_count = Counter('bikeshop_requests_total',
+                        'Total number of requests')
+http_requests = Counter('http_requests_total',
+                        'HTTP requests by endpoint and status code',
+                        ['endpoint', 'status'])
+request_latency = Histogram('bikeshop_request_latency_seconds',
+                            'Request latency in seconds')
+response_size = Histogram('bikeshop_response_size_bytes',
+                          'Response size in bytes')
+dropped_spans = Counter('bikeshop_dropped_spans_total',
+                        'Spans dropped because the export queue was full')
@@ -0,0 +1,117 @@
+from opentelemetry import trace
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+from opentelemetry.sdk.trace import SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.instrumentation.flask import FlaskInstrumentor
+from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+from opentelemetry.sdk.resources import Resource
+from metrics import dropped_spans
+import collections
+import os
+import threading
+import logging
+
+
+logger = logging.getLogger("bikeshop")
+
+
+# OpenTelemetry: неблокирующий экспорт спанов
+class AsyncSpanProcessor(SpanProcessor):
+    """Складывает спаны в кольцевой буфер (deque) без блокировок и
+    экспортирует их пачками из фонового потока. Поток просыпается раз в
+    export_interval секунд или сразу, как только накопилась пачка. При
+    переполнении буфера спан отбрасывается, чтобы обработчик запроса никогда
+    не блокировался на трейсинге."""
+
+    def __init__(self, exporter, max_queue=2048, max_batch=256,
+                 export_interval=5.0):
+        self._exporter = exporter
+        # Без maxlen: deque не должен молча вытеснять старые спаны, предел
+        # соблюдается проверкой в on_end и каждый отброс попадает в метрику
+        self._spans = collections.deque()
+        self._max_queue = max_queue
+        self._max_batch = max_batch
+        self._export_interval = export_interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run,
+                                        name='AsyncSpanProcessor',
+                                        daemon=True)
+        self._worker.start()
+
+    def on_end(self, span):
+        if not span.context.trace_flags.sampled:
+            return
+        pending = len(self._spans)
+        if pending >= self._max_queue:
+            dropped_spans.inc()
+            return
+        self._spans.append(span)
+        if pending + 1 >= self._max_batch:
+            self._wakeup.set()
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self._max_batch:
+            try:
+                batch.append(self._spans.popleft())
+            except IndexError:
+                break
+        return batch
+
+    def _export(self, batch):
+        try:
+            self._exporter.export(batch)
+        except Exception:
+            logger.exception("Failed to export %d spans.", len(batch))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self._export_interval)
+            self._wakeup.clear()
+            self.force_flush()
+        self.force_flush()
+
+    def force_flush(self, timeout_millis=30000):
+        batch = self._drain()
+        while batch:
+            self._export(batch)
+            batch = self._drain()
+        return True
+
+    def shutdown(self):
+        self._stopped.set()
+        self._wakeup.set()
+        self._worker.join()
+        self._exporter.shutdown()
+
+
+# OpenTelemetry: настройка трейсинга (включается через OTEL_ENABLED=1)
+tracing_enabled = os.getenv('OTEL_ENABLED') == '1'
+
+if tracing_enabled:
+    resource = Resource(attributes={"service.name": "bikeshop"})
+    # Head-based сэмплирование: доля трейсов задается OTEL_SAMPLE_RATIO
+    sampler = ParentBased(
+        TraceIdRatioBased(float(os.getenv('OTEL_SAMPLE_RATIO', '0.05'))))
+    trace_provider = TracerProvider(resource=resource, sampler=sampler)
+    trace.set_tracer_provider(trace_provider)
+
+    otlp_exporter = OTLPSpanExporter(
+        endpoint="http://localhost:4318/v1/traces",
+        headers={}
+    )
+    span_processor = AsyncSpanProcessor(otlp_exporter, max_queue=2048,
+                                        max_batch=256)
+    trace_provider.add_span_processor(span_processor)
+
+tracer = trace.get_tracer("bikeshop")
+
+
+# Инструментирование Flask и SQLAlchemy
+def instrument(app, engine):
+    if not tracing_enabled:
+        return
+    FlaskInstrumentor().instrument_app(
+        app, excluded_urls='/metrics,/static,/swagger')
+    SQLAlchemyInstrumentor().instrument(engine=engine)